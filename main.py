@@ -5,6 +5,7 @@ from __future__ import annotations
 
 import discord
 
+import asyncio
 from datetime import datetime, timezone
 from functools import wraps
 import os
@@ -22,6 +23,11 @@ from unique_names_generator.data import ADJECTIVES, COLORS, ANIMALS
 
 DEPLOY = False  # deploy todo: True
 
+_UPPER = string.ascii_uppercase
+_DIGITS = string.digits[1:]
+_TABLE_RE = re.compile(r'table number is .+\.$')
+TEAM_CHANNEL_CAT_NAME = 'Team Channels'
+
 
 def console_log_with_time(msg: str, **kwargs):
     print(f'[team] {datetime.now(tz=timezone.utc):%Y/%m/%d %H:%M:%S%f%z} - {msg}', **kwargs)
@@ -31,28 +37,54 @@ class CursorCallable(t.Protocol):
     def __call__(self, db_cursor: sqlite3.Cursor = None, *args, **kwargs) -> t.Any: ...
 
 
+con = sqlite3.connect('team/data.db', check_same_thread=False, isolation_level=None)
+con.execute(
+    'CREATE TABLE IF NOT EXISTS Teams '  # NB: table_number is text to allow for 1.12 etc.
+    '(team_name TEXT PRIMARY KEY, leader_id INTEGER, table_number TEXT, join_code TEXT, id INTEGER, role_id INTEGER)'
+)
+if 'role_id' not in {r[1] for r in con.execute('PRAGMA table_info(Teams)')}:  # databases made before role_id
+    con.execute('ALTER TABLE Teams ADD COLUMN role_id INTEGER')
+con.execute(
+    'CREATE TABLE IF NOT EXISTS Users '
+    '(user_id INTEGER PRIMARY KEY, team_name TEXT)'
+)
+con.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_teams_join_code ON Teams(join_code)')
+con.execute('CREATE INDEX IF NOT EXISTS idx_users_team_name ON Users(team_name)')
+con.execute('DELETE FROM Teams WHERE id IS NULL')  # placeholders left by a /make interrupted by a crash or restart
+con.execute('PRAGMA journal_mode=WAL')
+con.execute('PRAGMA synchronous=NORMAL')
+con.execute('PRAGMA temp_store=MEMORY')
+con.execute('PRAGMA cache_size=-64000')
+
+
+_on_commit_callbacks: t.List[t.Callable[[], t.Any]] = []
+
+
+def on_commit(callback: t.Callable[[], t.Any]):
+    """Runs callback once the current transaction commits. It is dropped if the transaction rolls back."""
+    _on_commit_callbacks.append(callback)
+
+
 def db_connect_wrapper(func: CursorCallable):
-    """Wrapper handles opening database, creating tables if they don't exist yet, and closing database."""
+    """Wrapper passes a cursor on the shared connection to func, running it inside a single transaction."""
     @wraps(func)
     def connect_to_db(*args, **kwargs):
-        console_log_with_time(f'[{func.__name__}] Opening database...')
-        con = sqlite3.connect('team/data.db')
-        cur = con.cursor()
+        if not DEPLOY:
+            console_log_with_time(f'[{func.__name__}] Querying database...')
 
-        cur.execute(
-            'CREATE TABLE IF NOT EXISTS Teams '  # NB: table_number is text to allow for 1.12 etc.
-            '(team_name TEXT PRIMARY KEY, leader_id INTEGER, table_number TEXT, join_code TEXT, id INTEGER)'
-        )
-        cur.execute(
-            'CREATE TABLE IF NOT EXISTS Users '
-            '(user_id INTEGER PRIMARY KEY, team_name TEXT)'
-        )
+        if con.in_transaction:  # nested call: run as part of the caller's transaction
+            return func(*args, **kwargs, db_cursor=con.cursor())
 
-        func_result = func(*args, **kwargs, db_cursor=cur)
+        try:
+            with con:
+                con.execute('BEGIN')
+                func_result = func(*args, **kwargs, db_cursor=con.cursor())
+        except BaseException:
+            _on_commit_callbacks.clear()
+            raise
 
-        con.commit()
-        con.close()
-        console_log_with_time(f'[{func.__name__}] Database closed.')
+        while _on_commit_callbacks:
+            _on_commit_callbacks.pop(0)()
 
         return func_result
 
@@ -90,15 +122,17 @@ client = TeamerClient(1035865794359345192)  # DurHack Discord id
 
 @db_connect_wrapper
 def gen_team_name(db_cursor: sqlite3.Cursor = None) -> str:
+    """Generates a unique team name and reserves it with a placeholder row in Teams."""
     def make_name():
         return get_random_name(combo=[ADJECTIVES, COLORS, ANIMALS], separator='-', style='lowercase') + 's'
 
-    name = ''
-    current_teams = set([r[0] for r in db_cursor.execute('SELECT team_name FROM Teams').fetchall()])
-    while not name or name in current_teams:
+    while True:
         name = make_name()
-
-    return name
+        try:
+            db_cursor.execute('INSERT OR ABORT INTO Teams (team_name) VALUES (?)', (name,))
+        except sqlite3.IntegrityError:
+            continue  # name already taken
+        return name
 
 
 @db_connect_wrapper
@@ -120,12 +154,16 @@ async def on_team(inter: discord.Interaction) -> str:
 
 
 @db_connect_wrapper
-def create_team(team_name: str, leader_id: int, table_number: str, join_code: str, channel_id: int,
+def create_team(team_name: str, leader_id: int, table_number: str, channel_id: int, role_id: int,
                 db_cursor: sqlite3.Cursor = None):
+    """Fills in the team row reserved by gen_team_name."""
     db_cursor.execute(
-        'INSERT INTO Teams (team_name, leader_id, table_number, join_code, id) VALUES (?, ?, ?, ?, ?)',
-        (team_name, leader_id, table_number, join_code, channel_id)
+        'UPDATE Teams SET leader_id = ?, table_number = ?, id = ?, role_id = ? WHERE team_name = ?',
+        (leader_id, table_number, channel_id, role_id, team_name)
     )
+    if db_cursor.rowcount == 0:
+        raise ValueError(f'{team_name} has not been reserved')
+    on_commit(lambda: team_names().add(team_name))
 
 
 @db_connect_wrapper
@@ -141,61 +179,124 @@ def add_user_to_team(user_id: int, team_name: str, db_cursor: sqlite3.Cursor = N
 
 
 @db_connect_wrapper
-def make_join_code(db_cursor: sqlite3.Cursor = None) -> str:
+def make_join_code(team_name: str, db_cursor: sqlite3.Cursor = None) -> str:
+    """Generates a unique join code and assigns it to the (reserved) team team_name."""
     def make_code():
-        code_parts = random.choices(list(string.ascii_uppercase), k=4) + random.choices(list(string.digits[1:]), k=3)
+        code_parts = random.choices(_UPPER, k=4) + random.choices(_DIGITS, k=3)
         random.shuffle(code_parts)
         return ''.join(code_parts)
 
-    join_code = ''
-    current_codes = set([r[0] for r in db_cursor.execute('SELECT join_code FROM Teams').fetchall()])
-    while not join_code or join_code in current_codes:
+    while True:
         join_code = make_code()
+        try:
+            db_cursor.execute('UPDATE OR ABORT Teams SET join_code = ? WHERE team_name = ?', (join_code, team_name))
+        except sqlite3.IntegrityError:
+            continue  # code already in use
+        return join_code
+
+
+@db_connect_wrapper
+def reserve_team(db_cursor: sqlite3.Cursor = None) -> t.Tuple[str, str]:
+    """Reserves a new team name and join code in one transaction."""
+    team_name = gen_team_name()
+    return team_name, make_join_code(team_name)
 
-    return join_code
+
+@db_connect_wrapper
+def register_team(team_name: str, leader_id: int, table_number: str, channel_id: int, role_id: int,
+                  db_cursor: sqlite3.Cursor = None):
+    """Completes a reserved team and adds its leader as the first member in one transaction."""
+    create_team(team_name, leader_id, table_number, channel_id, role_id)
+    add_user_to_team(leader_id, team_name)
+
+
+async def delete_discord_objects(*objs: t.Union[discord.Role, discord.abc.GuildChannel], reason: str):
+    await asyncio.gather(*(obj.delete(reason=reason) for obj in objs))
 
 
 async def make_team_channel(guild: discord.Guild,
                             team_name: str, channel_description: str) -> t.Tuple[discord.Role, discord.TextChannel]:
 
-    team_role = await guild.create_role(name=team_name, colour=discord.Colour.from_str('#592275'), mentionable=True,
-                                        reason='New team role created automatically by Teamer bot.')
-
-    team_channel_cat = discord.utils.get(guild.categories, name='Team Channels')
+    team_channel_cat = discord.utils.get(guild.categories, name=TEAM_CHANNEL_CAT_NAME)
 
-    team_channel = await team_channel_cat.create_text_channel(
-        team_name,
-        topic=channel_description
+    results = await asyncio.gather(
+        guild.create_role(name=team_name, colour=discord.Colour.from_str('#592275'), mentionable=True,
+                          reason='New team role created automatically by Teamer bot.'),
+        team_channel_cat.create_text_channel(
+            team_name,
+            topic=channel_description
+        ),
+        return_exceptions=True
     )
-    await team_channel.edit(sync_permissions=True)
-    perms = team_channel.overwrites
+    if errors := [r for r in results if isinstance(r, BaseException)]:
+        # don't leave behind whichever of the role and channel did get made
+        await delete_discord_objects(*(r for r in results if not isinstance(r, BaseException)),
+                                     reason='Team setup failed in /make command.')
+        raise errors[0]
+    team_role, team_channel = results
+
+    # category's permissions (as sync_permissions would copy) plus the team role, set in a single edit
+    perms = dict(team_channel_cat.overwrites)
     perms[team_role] = discord.PermissionOverwrite(view_channel=True)
-    await team_channel.edit(
-        overwrites=perms,
-        reason='Allow team members to view channel.'
-    )
+    try:
+        await team_channel.edit(
+            overwrites=perms,
+            reason='Allow team members to view channel.'
+        )
+    except BaseException:
+        await delete_discord_objects(team_role, team_channel, reason='Team setup failed in /make command.')
+        raise
 
     return team_role, team_channel
 
 
+def get_team_role(guild: discord.Guild, team_name: str, role_id: t.Optional[int]) -> t.Optional[discord.Role]:
+    """Team role by its stored id, or by name for teams made before role ids were stored.
+    None if the role no longer exists."""
+    if role_id is not None:
+        return guild.get_role(role_id)
+    else:
+        return discord.utils.get(guild.roles, name=team_name)
+
+
 @db_connect_wrapper
-def get_current_teams(db_cursor: sqlite3.Cursor = None) -> t.List[str]:
-    return [r[0] for r in db_cursor.execute('SELECT team_name FROM Teams').fetchall()]
+def get_current_teams(db_cursor: sqlite3.Cursor = None) -> t.Set[str]:
+    # rows without a channel id are names still reserved by an in-progress /make
+    return {r[0] for r in db_cursor.execute('SELECT team_name FROM Teams WHERE id IS NOT NULL')}
+
+
+_team_name_cache: t.Optional[t.Set[str]] = None
+
+
+def team_names() -> t.Set[str]:
+    """In-memory set of current team names, loaded from the database on first use.
+    Kept up to date (once their writes commit) by create_team, delete_team_from_db and drop_user."""
+    global _team_name_cache
+    if _team_name_cache is None:
+        _team_name_cache = get_current_teams()
+    return _team_name_cache
 
 
 @db_connect_wrapper
-def delete_team_from_db(team_name: str, db_cursor: sqlite3.Cursor = None):
-    db_cursor.execute('DELETE FROM Teams WHERE team_name = ?', (team_name, ))
+def delete_team_from_db(team_name: str, db_cursor: sqlite3.Cursor = None) -> t.Optional[int]:
+    """Deletes team_name and its members, returning the team's role id."""
+    resp = db_cursor.execute('DELETE FROM Teams WHERE team_name = ? RETURNING role_id', (team_name, )).fetchone()
     db_cursor.execute('DELETE FROM Users WHERE team_name = ?', (team_name,))
+    on_commit(lambda: team_names().discard(team_name))
+
+    return resp[0] if resp else None
 
 
 @client.event
 async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
-    if (team_name := channel.name) in get_current_teams():
-        delete_team_from_db(team_name)
+    if not channel.category or channel.category.name != TEAM_CHANNEL_CAT_NAME:
+        return  # not in the team channels category so can't be a team channel
+
+    if (team_name := channel.name) in team_names():
+        role_id = delete_team_from_db(team_name)
 
-        team_role: discord.Role = discord.utils.get(channel.guild.roles, name=team_name)
-        await team_role.delete(reason='Channel deleted through Discord.')
+        if team_role := get_team_role(channel.guild, team_name, role_id):
+            await team_role.delete(reason='Channel deleted through Discord.')
 
         console_log_with_time(f'**{team_name}** channels and roles deleted successfully.')
 
@@ -212,30 +313,41 @@ async def make(inter: discord.Interaction,
     if await on_team(inter):
         return
 
-    team_name = gen_team_name()
-
-    # make join code and put in channel description
-    join_code = make_join_code()
+    # reserve team name and join code, then put them in channel description
+    team_name, join_code = reserve_team()
 
     channel_description = f'This is the channel for **{team_name}**! The `/join` code is `{join_code}`. ' \
                           f'The table number is {table_number}.'
 
     # make team channel and role
-    team_role, team_channel = await make_team_channel(inter.guild, team_name, channel_description)
-    await inter.user.add_roles(team_role, reason='Added by Teamer bot via /make command.')
-
-    create_team(team_name, inter.user.id, table_number, join_code, team_channel.id)
-    add_user_to_team(inter.user.id, team_name)
+    try:
+        team_role, team_channel = await make_team_channel(inter.guild, team_name, channel_description)
+    except BaseException:
+        delete_team_from_db(team_name)  # free reserved name and code
+        raise
 
-    await team_channel.send(f'Hi, {inter.user.mention}!\n{channel_description}')
-    await inter.response.send_message(f'Team **{team_name}** successfully created: '
-                                      f'check out {team_channel.mention}!\n'
-                                      f'Contact the team leader for a join code!')
+    try:
+        register_team(team_name, inter.user.id, table_number, team_channel.id, team_role.id)
+    except BaseException:
+        delete_team_from_db(team_name)
+        await delete_discord_objects(team_role, team_channel, reason='Team could not be saved by /make command.')
+        raise
+
+    await asyncio.gather(
+        inter.user.add_roles(team_role, reason='Added by Teamer bot via /make command.'),
+        team_channel.send(f'Hi, {inter.user.mention}!\n{channel_description}'),
+        inter.response.send_message(f'Team **{team_name}** successfully created: '
+                                    f'check out {team_channel.mention}!\n'
+                                    f'Contact the team leader for a join code!')
+    )
 
 
 @db_connect_wrapper
-def resolve_join_code(join_code: str, db_cursor: sqlite3.Cursor = None) -> t.Optional[t.Tuple[str]]:
-    return db_cursor.execute('SELECT team_name, id FROM Teams WHERE join_code = ?', (join_code,)).fetchone()
+def resolve_join_code(join_code: str, db_cursor: sqlite3.Cursor = None) -> t.Optional[t.Tuple[str, int, int]]:
+    # rows without a channel id are still being set up by /make
+    return db_cursor.execute(
+        'SELECT team_name, id, role_id FROM Teams WHERE join_code = ? AND id IS NOT NULL', (join_code,)
+    ).fetchone()
 
 
 @client.tree.command()
@@ -251,13 +363,13 @@ async def join(inter: discord.Interaction,
         return
 
     # check if code valid
-    if not (name_and_chan := resolve_join_code(join_code)):
+    if not (team_info := resolve_join_code(join_code)):
         await inter.response.send_message(f'`{join_code}` is not a valid join code. '
                                           f'Please confirm your code again with the team leader.',
                                           ephemeral=True)
         return
-    team_name, channel_id = name_and_chan
-    team_channel: discord.TextChannel = discord.utils.get(inter.guild.channels, id=channel_id)
+    team_name, channel_id, role_id = team_info
+    team_channel: discord.TextChannel = inter.guild.get_channel(channel_id)
 
     # todo: check if team full
 
@@ -265,10 +377,11 @@ async def join(inter: discord.Interaction,
     add_user_to_team(inter.user.id, team_name)
 
     # assign role
-    await inter.user.add_roles(
-        discord.utils.get(inter.guild.roles, name=team_name),
-        reason='Add new user to team'
-    )
+    if team_role := get_team_role(inter.guild, team_name, role_id):
+        await inter.user.add_roles(
+            team_role,
+            reason='Add new user to team'
+        )
     await inter.response.send_message(f"You've been successfully added to team **{team_name}**! "
                                       f"Head over to {team_channel.mention} to say hi 👋",
                                       ephemeral=True)
@@ -276,18 +389,38 @@ async def join(inter: discord.Interaction,
 
 
 @db_connect_wrapper
-def get_team_leader(team_name: str, db_cursor: sqlite3.Cursor = None) -> int:
-    return db_cursor.execute('SELECT leader_id FROM Teams WHERE team_name = ?', (team_name, )).fetchone()[0]
+def get_user_team_for_update(user_id: int, new_leader_id: t.Optional[int],
+                             db_cursor: sqlite3.Cursor = None) -> t.Optional[t.Tuple[str, int, t.Optional[str], int]]:
+    """Returns (team_name, leader_id, new_leader_team_name, channel_id) for user_id's team,
+    or None if not on a team."""
+    return db_cursor.execute(
+        'SELECT t.team_name, t.leader_id, u2.team_name, t.id FROM Users u1 JOIN Teams t ON t.team_name = u1.team_name '
+        'LEFT JOIN Users u2 ON u2.user_id = ? WHERE u1.user_id = ?',
+        (new_leader_id, user_id)
+    ).fetchone()
 
 
 @db_connect_wrapper
-def update_leader(team_name: str, leader_id: int, db_cursor: sqlite3.Cursor = None):
-    db_cursor.execute('UPDATE Teams SET leader_id = ? WHERE team_name = ?', (leader_id, team_name))
+def get_team_for_update(team_name: str, new_leader_id: t.Optional[int],
+                        db_cursor: sqlite3.Cursor = None) -> t.Tuple[str, int, t.Optional[str], int]:
+    """Returns (team_name, leader_id, new_leader_team_name, channel_id) for team_name."""
+    return db_cursor.execute(
+        'SELECT t.team_name, t.leader_id, u2.team_name, t.id FROM Teams t '
+        'LEFT JOIN Users u2 ON u2.user_id = ? WHERE t.team_name = ?',
+        (new_leader_id, team_name)
+    ).fetchone()
 
 
 @db_connect_wrapper
-def update_table_num(team_name: str, table_number: str, db_cursor: sqlite3.Cursor = None):
-    db_cursor.execute('UPDATE Teams SET table_number = ? WHERE team_name = ?', (table_number, team_name))
+def update_team(team_name: str, leader_id: t.Optional[int], table_number: t.Optional[str],
+                db_cursor: sqlite3.Cursor = None) -> t.Tuple[int, str]:
+    """Updates the leader and/or table number of team_name. None leaves that field unchanged.
+    Returns the team's resulting (leader_id, table_number)."""
+    return db_cursor.execute(
+        'UPDATE Teams SET leader_id = COALESCE(?, leader_id), table_number = COALESCE(?, table_number) '
+        'WHERE team_name = ? RETURNING leader_id, table_number',
+        (leader_id, table_number, team_name)
+    ).fetchone()
 
 
 @client.tree.command()
@@ -303,34 +436,37 @@ async def update(inter: discord.Interaction,
         await inter.response.send_message('You have to provide at least one argument.', ephemeral=True)
         return
 
+    new_leader_id = new_leader.id if new_leader else None
+
     # checks only apply to non-moderators
     if not discord.utils.get(inter.user.roles, name='Moderator'):
         # check if on a team
-        if not (team_name := on_which_team(inter.user.id)):
+        if not (team_info := get_user_team_for_update(inter.user.id, new_leader_id)):
             await inter.response.send_message('You are not currently on a team.', ephemeral=True)
             return
+        team_name, leader_id, new_leader_team, channel_id = team_info
 
         # check team leader is executing command
-        if (leader_id := get_team_leader(team_name)) != inter.user.id:
+        if leader_id != inter.user.id:
             await inter.response.send_message('You are not the currently the leader of your team.', ephemeral=True)
             return
     else:
         console_log_with_time('Moderator using permissions to edit team info.')
         team_name = inter.channel.name
-        if team_name not in get_current_teams():
+        if team_name not in team_names():
             await inter.response.send_message(
                 'As a moderator, you have to use this command within a team channel.', ephemeral=True
             )
             return
 
-        leader_id = get_team_leader(team_name)
+        team_name, leader_id, new_leader_team, channel_id = get_team_for_update(team_name, new_leader_id)
 
-    team_channel: discord.TextChannel = discord.utils.get(inter.guild.channels, name=team_name)
+    team_channel: discord.TextChannel = inter.guild.get_channel(channel_id)
     response_msg = ''
 
     # check new leader is already on the team
     if new_leader:
-        if on_which_team(new_leader.id) != on_which_team(leader_id):
+        if new_leader_team != team_name:
             await inter.response.send_message(
                 'The new leader must be an existing member of this team.',
                 ephemeral=True
@@ -340,26 +476,49 @@ async def update(inter: discord.Interaction,
             await inter.response.send_message(f"You are already the leader of this team. 😆", ephemeral=True)
             return
 
-        update_leader(team_name, new_leader.id)
         response_msg += f'{new_leader.mention} is the new leader of **{team_name}**! 🎉\n'
 
+    _, stored_table_number = update_team(team_name, new_leader_id, table_number)
+
     if table_number:
-        update_table_num(team_name, table_number)
-        new_description = re.sub(r'table number is .+\.$', f'table number is {table_number}.', team_channel.topic)
+        new_description = _TABLE_RE.sub(f'table number is {stored_table_number}.', team_channel.topic)
         await team_channel.edit(topic=new_description)
-        response_msg += f"**{team_name}**'s new table number is **{table_number}**!"
+        response_msg += f"**{team_name}**'s new table number is **{stored_table_number}**!"
 
     await inter.response.send_message(response_msg.strip('\n'))
 
 
 @db_connect_wrapper
-def drop_user(user_id: int, db_cursor: sqlite3.Cursor = None):
+def drop_user(user_id: int, team_name: str, db_cursor: sqlite3.Cursor = None) -> bool:
+    """Removes user_id from team_name, deleting the team too if it is now empty.
+    Returns True if the team was deleted."""
     db_cursor.execute('DELETE FROM Users WHERE user_id = ?', (user_id,))
+    db_cursor.execute(
+        'DELETE FROM Teams WHERE team_name = ? AND NOT EXISTS (SELECT 1 FROM Users WHERE team_name = ?)',
+        (team_name, team_name)
+    )
+    if team_deleted := db_cursor.rowcount > 0:
+        on_commit(lambda: team_names().discard(team_name))
+
+    return team_deleted
 
 
 @db_connect_wrapper
-def count_members(team_name: str, db_cursor: sqlite3.Cursor = None) -> int:
-    return db_cursor.execute('SELECT COUNT(*) FROM Users WHERE team_name = ?', (team_name,)).fetchone()[0]
+def get_membership(user_id: int, db_cursor: sqlite3.Cursor = None) -> t.Optional[t.Tuple[str, int, bool, int, int]]:
+    """Returns (team_name, leader_id, has_other_members, channel_id, role_id) for user_id's team,
+    or None if not on a team."""
+    resp = db_cursor.execute(
+        'SELECT t.team_name, t.leader_id, '
+        'EXISTS(SELECT 1 FROM Users WHERE team_name = t.team_name AND user_id <> u.user_id LIMIT 1), t.id, t.role_id '
+        'FROM Users u JOIN Teams t ON t.team_name = u.team_name WHERE u.user_id = ?',
+        (user_id,)
+    ).fetchone()
+
+    if resp:
+        team_name, leader_id, has_other_members, channel_id, role_id = resp
+        return team_name, leader_id, bool(has_other_members), channel_id, role_id
+    else:
+        return None
 
 
 @client.tree.command()
@@ -367,22 +526,23 @@ async def leave(inter: discord.Interaction):
     """Leaves the team you are currently on."""
 
     # check if in a team
-    if not (team_name := on_which_team(inter.user.id)):
+    if not (membership := get_membership(inter.user.id)):
         await inter.response.send_message("You don't appear to be on a team. You can't leave nothing!",
                                           ephemeral=True)
         return
+    team_name, leader_id, has_other_members, channel_id, role_id = membership
 
     # check if team leader
-    if get_team_leader(team_name) == inter.user.id and count_members(team_name) > 1:
+    if leader_id == inter.user.id and has_other_members:
         await inter.response.send_message("You can't leave a team where you're the leader! "
                                           "Use `/update` to change the team leader.", ephemeral=True)
         return
 
-    # remove from db
-    drop_user(inter.user.id)
+    # remove from db (and delete team if now empty)
+    team_empty = drop_user(inter.user.id, team_name)
 
-    team_role: discord.Role = discord.utils.get(inter.guild.roles, name=team_name)
-    await inter.user.remove_roles(team_role, reason='User left team.')
+    if team_role := get_team_role(inter.guild, team_name, role_id):
+        await inter.user.remove_roles(team_role, reason='User left team.')
 
     # todo: update member count
 
@@ -393,13 +553,12 @@ async def leave(inter: discord.Interaction):
     # await team_making_channel.send(leaving_msg)
 
     # if team is empty
-    if count_members(team_name) == 0:
-        delete_team_from_db(team_name)
-
+    if team_empty:
         #   remove role (not channel)
-        await team_role.delete(reason='Team was empty after `/leave` command.')
+        if team_role:
+            await team_role.delete(reason='Team was empty after `/leave` command.')
 
-        team_channel: discord.TextChannel = discord.utils.get(inter.guild.channels, name=team_name)
+        team_channel: discord.TextChannel = inter.guild.get_channel(channel_id)
         await team_channel.send('🗑️ Channel marked as archived when all members left.')
         await team_channel.edit(name=f'🗑️{team_name}')
 
@@ -413,7 +572,7 @@ def get_table_from_db(team_name: str, db_cursor: sqlite3.Cursor = None) -> str:
 async def get_table_number(inter: discord.Interaction, team_name: str):
     """Retrieves the table number for team_name from the database"""
 
-    if team_name.lower() not in get_current_teams():
+    if team_name.lower() not in team_names():
         await inter.response.send_message(
             f'`{team_name}` is not a valid team name. Make sure to include any `-`s.',
             ephemeral=True
@@ -426,6 +585,13 @@ async def get_table_number(inter: discord.Interaction, team_name: str):
     )
 
 
+def write_error_log(log_filepath: str, header: str, err: BaseException):
+    """Writes header and err's formatted traceback to log_filepath. Blocking, so run via asyncio.to_thread."""
+    log_text = header + ''.join(traceback.TracebackException.from_exception(err).format())
+    with open(log_filepath, 'w+') as fobj:
+        fobj.write(log_text)
+
+
 @make.error
 @join.error
 @update.error
@@ -435,11 +601,9 @@ async def cmd_error(inter: discord.Interaction, err: discord.app_commands.AppCom
     time_str = f'{datetime.now(tz=timezone.utc):%Y%m%d_%H%M%S.%f}'
     log_filepath = f'team/errors/{time_str}_traceback.log'
 
-    with open(log_filepath, 'w+') as fobj:
-        fobj.write(f'Error at {time_str}\nUser: {inter.user.id} | Channel: {inter.channel.id}\nData: {inter.data}\n')
-        fobj.write(f'Error with `/{inter.command.name}` command: {err!s}\n\n')
-        fobj.write(''.join(traceback.TracebackException.from_exception(err).format()))
-        fobj.close()
+    log_header = f'Error at {time_str}\nUser: {inter.user.id} | Channel: {inter.channel.id}\nData: {inter.data}\n' \
+                 f'Error with `/{inter.command.name}` command: {err!s}\n\n'
+    await asyncio.to_thread(write_error_log, log_filepath, log_header, err)
 
     console_log_with_time(f'Error traceback written to {log_filepath}')
 